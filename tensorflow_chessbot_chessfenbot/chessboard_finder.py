@@ -273,14 +273,11 @@ def getChessTilesColor(img, corners):
 
   # stack deep 64 tiles with 3 channesl RGB each
   # so, first 3 slabs are RGB for tile A1, then next 3 slabs for tile A2 etc.
-  tiles = np.zeros([32,32,3*64], dtype=np.float32) # color
+  # Split into (row, y, col, x, channel) blocks in one reshape.
   # Assume A1 is bottom left of image, need to reverse rank since images start
   # with origin in top left
-  for rank in range(8): # rows (numbers)
-    for file in range(8): # columns (letters)
-      # color
-      tiles[:,:,3*(rank*8+file):3*(rank*8+file+1)] = \
-        chessboard_img_resized[(7-rank)*32:((7-rank)+1)*32,file*32:(file+1)*32]
+  tiles = chessboard_img_resized.reshape(8,32,8,32,3)[::-1] \
+    .transpose(1,3,0,2,4).reshape(32,32,3*64)
 
   return tiles
 
@@ -320,13 +317,11 @@ def getTiles(processed_gray_img):
   # 
   # stack deep 64 tiles
   # so, first slab is tile A1, then A2 etc.
-  tiles = np.zeros([32,32,64], dtype=np.float32) # grayscale
+  # Split into (row, y, col, x) blocks in one reshape.
   # Assume A1 is bottom left of image, need to reverse rank since images start
   # with origin in top left
-  for rank in range(8): # rows (numbers)
-    for file in range(8): # columns (letters)
-      tiles[:,:,(rank*8+file)] = \
-        processed_gray_img[(7-rank)*32:((7-rank)+1)*32,file*32:(file+1)*32]
+  tiles = np.asarray(processed_gray_img, dtype=np.float32).reshape(8,32,8,32)[::-1] \
+    .transpose(1,3,0,2).reshape(32,32,64)
 
   return tiles
 
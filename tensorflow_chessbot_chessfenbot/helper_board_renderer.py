@@ -0,0 +1,97 @@
+import os
+import argparse
+import numpy as np
+import PIL.Image
+
+from helper_functions import lengthenFEN
+
+# Цвета клеток как у стандартной доски Lichess (тема brown)
+LIGHT_SQUARE = (240, 217, 181)
+DARK_SQUARE = (181, 136, 99)
+
+# Символ FEN -> имя файла фигуры в наборах lichess-org/lila (public/piece/<set>/wK.svg)
+PIECE_FILES = {
+    'K': 'wK', 'Q': 'wQ', 'R': 'wR', 'B': 'wB', 'N': 'wN', 'P': 'wP',
+    'k': 'bK', 'q': 'bQ', 'r': 'bR', 'b': 'bB', 'n': 'bN', 'p': 'bP',
+}
+
+
+def load_piece(piece_path, square_size):
+    """Загружает фигуру (png или svg) как RGBA массив square_size x square_size"""
+    if piece_path.endswith('.svg'):
+        # cairosvg нужен только для svg наборов
+        import cairosvg
+        from io import BytesIO
+        png_bytes = cairosvg.svg2png(url=piece_path, output_width=square_size, output_height=square_size)
+        img = PIL.Image.open(BytesIO(png_bytes))
+    else:
+        img = PIL.Image.open(piece_path)
+    img = img.convert('RGBA').resize([square_size, square_size], PIL.Image.LANCZOS)
+    return np.asarray(img, dtype=np.float32)
+
+
+class BoardRenderer:
+    """Рисует доску по FEN локально, без браузера и запросов к Lichess"""
+
+    def __init__(self, piece_folder, square_size=64):
+        self.square_size = square_size
+
+        # Растеризуем фигуры один раз и храним как массивы
+        self.pieces = {}
+        for piece, name in PIECE_FILES.items():
+            for ext in ('.png', '.svg'):
+                piece_path = os.path.join(piece_folder, name + ext)
+                if os.path.exists(piece_path):
+                    self.pieces[piece] = load_piece(piece_path, square_size)
+                    break
+            else:
+                raise IOError(f"Не найдена фигура {name} в {piece_folder}")
+
+        # Пустая доска, копируется для каждой новой позиции
+        checkers = (np.indices([8, 8]).sum(axis=0) % 2)[:, :, None]
+        board = np.where(checkers, DARK_SQUARE, LIGHT_SQUARE).astype(np.float32)
+        self.empty_board = board.repeat(square_size, axis=0).repeat(square_size, axis=1)
+
+    def render(self, fen_string):
+        """Возвращает PIL изображение доски для FEN (разделители '/' или '-')"""
+        s = self.square_size
+        # Берем только расстановку, без очереди хода и прочих полей
+        layout = fen_string.replace('-', '/').split('_')[0].split(' ')[0]
+        ranks = lengthenFEN(layout).split('/')
+
+        board = self.empty_board.copy()
+        for row, rank in enumerate(ranks):
+            for col, piece in enumerate(rank):
+                if piece == '1':
+                    continue
+                # Альфа-композиция фигуры поверх клетки
+                rgba = self.pieces[piece]
+                alpha = rgba[:, :, 3:] / 255.
+                square = board[row * s:(row + 1) * s, col * s:(col + 1) * s]
+                square[:] = rgba[:, :, :3] * alpha + square * (1. - alpha)
+        return PIL.Image.fromarray(board.astype(np.uint8))
+
+
+_renderers = {}
+
+
+def render_board(fen_string, output_filename, piece_folder, square_size=64):
+    """Рисует доску по FEN и сохраняет в output_filename
+
+    piece_folder - папка с фигурами wK.png ... bP.png (или .svg), например
+    public/piece/cburnett из lichess-org/lila; в репозитории фигур нет.
+    """
+    key = (piece_folder, square_size)
+    if key not in _renderers:
+        _renderers[key] = BoardRenderer(piece_folder, square_size)
+    _renderers[key].render(fen_string).save(output_filename)
+    print(f"Доска сохранена в {output_filename}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Рисует доску по FEN локально')
+    parser.add_argument('piece_folder', type=str, help='Папка с фигурами (wK.png/svg ... bP.png/svg)')
+    parser.add_argument('--fen', type=str, default="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR_w_KQkq_-_0_1")
+    parser.add_argument('--output', type=str, default="chessboard.png")
+    args = parser.parse_args()
+    render_board(args.fen, args.output, args.piece_folder)
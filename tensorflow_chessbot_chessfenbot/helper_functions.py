@@ -1,4 +1,5 @@
 import numpy as np
+import glob
 
 # Imports for visualization
 import PIL.Image
@@ -65,6 +66,18 @@ def getFENtileLabel(fen,letter,number):
   # We ignore shorter FENs with numbers > 1 because we generate the FENs ourselves
   return label
 
+# Byte value of FEN piece character -> label index, '1' (empty) is 0
+FEN_LABEL_LUT = np.zeros(256, dtype=np.uint8)
+for i, c in enumerate(b'1KQRBNPkqrbnp'):
+  FEN_LABEL_LUT[c] = i
+
+def getFENtileLabels(fen):
+  """Given a fen string ('/' or '-' separated), return label indices for all 64 tiles
+  in tile order (A1, B1, ... H8), matching getTiles"""
+  # 8 ranks of 8 pieces + separator, FEN has order backwards
+  fen_arr = np.frombuffer((lengthenFEN(fen) + '/').encode('ascii'), dtype=np.uint8).reshape(8, 9)
+  return FEN_LABEL_LUT[fen_arr[::-1, :8]].ravel()
+
 # We'll define the 12 pieces and 1 spacewith single characters 
 #  KQRBNPkqrbnp
 def getLabelForSquare(letter,number):
@@ -151,6 +164,44 @@ def loadFENtiles(image_filepaths):
   print("Done")
   return images, labels
 
+def loadTileShards(shard_folder, prefix='tiles'):
+  """Load tile shards written by tileset_generator.TileShardWriter.
+  return list of (images, labels) per shard, images as N x 32 x 32 x 1 uint8 and labels
+  as N uint8 piece indices, both memory mapped so nothing is read until it is used"""
+  shards = []
+  for tiles_path in sorted(glob.glob("%s/%s_*_tiles.npy" % (shard_folder, prefix))):
+    images = np.load(tiles_path, mmap_mode='r')[:,:,:,np.newaxis]
+    labels = np.load(tiles_path[:-len('tiles.npy')] + 'labels.npy', mmap_mode='r')
+    shards.append((images, labels))
+  return shards
+
+def loadFENtileShards(shard_folder, ratio, prefix='tiles'):
+  """Load tile shards in shard_folder randomly split into a train and test set, in the same
+  form as loadFENtiles, ratio is the fraction of tiles that go into the train set.
+  return (train_images, train_labels), (test_images, test_labels), images as N x 32 x 32 x 1 uint8
+  and one-hot labels as N x 13"""
+  shards = loadTileShards(shard_folder, prefix)
+  n_tiles = sum(len(shard_labels) for _, shard_labels in shards)
+  in_train = np.zeros(n_tiles, dtype=bool)
+  in_train[np.random.permutation(n_tiles)[:int(n_tiles * ratio)]] = True
+
+  sets = []
+  for selected in (in_train, ~in_train):
+    # Selected tiles are copied from each memory mapped shard straight into the set,
+    # the shards are never concatenated into one array first
+    images = np.zeros([np.count_nonzero(selected), 32, 32, 1], dtype=np.uint8)
+    labels = np.zeros([len(images), 13], dtype=np.float64)
+    start, pos = 0, 0
+    for shard_images, shard_labels in shards:
+      mask = selected[start:start + len(shard_labels)]
+      count = np.count_nonzero(mask)
+      images[pos:pos + count] = shard_images[mask]
+      labels[np.arange(pos, pos + count), shard_labels[mask]] = 1
+      start += len(shard_labels)
+      pos += count
+    sets.append((images, labels))
+  return sets[0], sets[1]
+
 def loadLabels(image_filepaths):
   """Load label vectors from list of image filepaths"""
   # Each filepath contains which square we're looking at, 
@@ -1,4 +1,6 @@
 import numpy as np
+import os
+import hashlib
 
 # Imports for visualization
 import PIL.Image
@@ -100,4 +102,44 @@ def getVisualizeLink(corners, url):
   encoded_url = quote(url, safe='')
   
   return ("http://tetration.xyz/tensorflow_chessbot/overlay_chessboard.html?%d,%d,%d,%d,%s" % 
-    (corners[0], corners[1], corners[2], corners[3], encoded_url))
\ No newline at end of file
+    (corners[0], corners[1], corners[2], corners[3], encoded_url))
+
+class DiagramCache(object):
+  """On-disk cache of downloaded/rendered board images, keyed by a hash of url (+ cookie)"""
+  def __init__(self, cache_folder='cache/diagrams'):
+    self.cache_folder = cache_folder
+    if not os.path.exists(cache_folder):
+      os.makedirs(cache_folder)
+
+  def getPath(self, url, cookie=''):
+    """Return cache filepath for url and cookie"""
+    key = hashlib.blake2b((url + cookie).encode(), digest_size=16).hexdigest()
+    return os.path.join(self.cache_folder, key + '.png')
+
+  def get(self, url, cookie=''):
+    """Return cached image bytes for url and cookie, or None on a miss"""
+    cache_path = self.getPath(url, cookie)
+    if not os.path.exists(cache_path):
+      return None
+    with open(cache_path, 'rb') as f:
+      return f.read()
+
+  def put(self, url, img_bytes, cookie=''):
+    """Store image bytes for url and cookie, return cache filepath"""
+    cache_path = self.getPath(url, cookie)
+    # Write to a temporary file and rename, so concurrent readers never see a partial image
+    tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+      f.write(img_bytes)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+  def link(self, url, output_filename, cookie=''):
+    """Hardlink cached image for url and cookie to output_filename, return False on a miss"""
+    cache_path = self.getPath(url, cookie)
+    if not os.path.exists(cache_path):
+      return False
+    if os.path.exists(output_filename):
+      os.remove(output_filename)
+    os.link(cache_path, output_filename)
+    return True
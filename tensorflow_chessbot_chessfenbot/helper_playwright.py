@@ -0,0 +1,175 @@
+import asyncio
+from playwright.async_api import async_playwright, Error as PlaywrightError
+
+LICHESS_URL = "https://lichess.org"
+LICHESS_EDITOR_URL = LICHESS_URL + "/editor/%s"
+# Положение доски на странице редактора (x0,y0 = 218,141, x1,y1 = 737,658)
+BOARD_CLIP = {'x': 218, 'y': 141, 'width': 519, 'height': 517}
+# Начальная позиция для прогрева кэша браузера
+WARMUP_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+NAVIGATION_TIMEOUT_MS = 10000
+# Доска готова, когда шрифты загружены, на ней все фигуры из FEN (n) и у каждой
+# фигуры применен фон из стилей набора фигур
+BOARD_READY_JS = (
+    "n => document.fonts.status === 'loaded' "
+    "&& document.querySelectorAll('cg-board piece').length === n "
+    "&& Array.from(document.querySelectorAll('cg-board piece'))"
+    ".every(p => getComputedStyle(p).backgroundImage !== 'none')")
+# Статические ресурсы, одинаковые для всех досок; документ редактора всегда грузится заново
+CACHED_RESOURCE_TYPES = {'stylesheet', 'script', 'image', 'font'}
+
+
+class PlaywrightScreenshotPool:
+    """Пул headless Chromium для параллельных скриншотов шахматных досок с Lichess
+
+    Браузер запускается один раз, одновременно работают n_workers контекстов,
+    каждый со своей cookie lila2 (тема, фон и набор фигур). В каждом контексте
+    одна страница, она переиспользуется для всех досок. Статические ресурсы
+    Lichess загружаются один раз и отдаются всем контекстам из общего кэша.
+    """
+
+    def __init__(self, n_workers=8, cookie=None, width=1024, height=768):
+        self.n_workers = n_workers
+        self.cookie = cookie
+        self.width = width
+        self.height = height
+        self.browser = None
+        self.contexts = []
+        self._playwright = None
+        self._free_pages = None
+        # url -> (status, headers, body), общий для всех контекстов
+        self.asset_cache = {}
+        # Текущая cookie контекста каждой страницы
+        self._page_cookies = {}
+
+    async def start(self):
+        """Запускает браузер, создает контексты и прогревает их страницы"""
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch()
+        # Очередь свободных страниц ограничивает число одновременных скриншотов
+        self._free_pages = asyncio.Queue()
+        pages = []
+        for _ in range(self.n_workers):
+            context = await self.browser.new_context(
+                viewport={'width': self.width, 'height': self.height})
+            if self.cookie:
+                await context.add_cookies([parse_cookie(self.cookie)])
+            await context.route('**/*', self.route_asset)
+            page = await context.new_page()
+            page.set_default_navigation_timeout(NAVIGATION_TIMEOUT_MS)
+            self.contexts.append(context)
+            self._page_cookies[page] = self.cookie
+            pages.append(page)
+
+        # Первая загрузка редактора заполняет кэш ресурсов, остальные страницы
+        # прогреваются уже из него (и заодно компилируют JS)
+        try:
+            await self.load_board(pages[0], WARMUP_FEN)
+        except PlaywrightError as e:
+            print(f"Ошибка прогрева: {e}")
+        await asyncio.gather(*[self.load_board(page, WARMUP_FEN) for page in pages[1:]],
+                             return_exceptions=True)
+        for page in pages:
+            self._free_pages.put_nowait(page)
+        return self
+
+    async def close(self):
+        """Закрывает браузер"""
+        if self.browser:
+            await self.browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+        self.browser = None
+        self.contexts = []
+        self._page_cookies = {}
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def route_asset(self, route):
+        """Отдает статические ресурсы из asset_cache, при промахе скачивает и сохраняет"""
+        request = route.request
+        if request.method != 'GET' or request.resource_type not in CACHED_RESOURCE_TYPES:
+            await route.continue_()
+            return
+
+        cached = self.asset_cache.get(request.url)
+        if cached is not None:
+            status, headers, body = cached
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except PlaywrightError:
+            await route.continue_()
+            return
+        if response.ok:
+            self.asset_cache[request.url] = (response.status, response.headers, body)
+        await route.fulfill(response=response, body=body)
+
+    @staticmethod
+    async def load_board(page, fen_string):
+        """Открывает редактор с FEN и ждет, пока доска отрисована со всеми фигурами
+
+        Без этого скриншот может попасть на доску без фигур или стилей набора,
+        и тайлы получат неверные метки. Ресурсы отдаются из asset_cache, поэтому
+        ожидание события load почти ничего не стоит.
+        """
+        await page.goto(LICHESS_EDITOR_URL % fen_string, wait_until='load')
+        layout = fen_string.split('_')[0].split(' ')[0]
+        n_pieces = sum(c.isalpha() for c in layout)
+        await page.wait_for_function(BOARD_READY_JS, arg=n_pieces)
+        await page.evaluate("document.fonts.ready.then(() => true)")
+
+    async def screenshot(self, fen_string, cookie=None, **screenshot_kwargs):
+        """Загружает доску по FEN и возвращает PNG байты скриншота, None при ошибке
+
+        cookie меняет тему для контекста взятой страницы, пока ее снова не поменяют.
+        """
+        page = await self._free_pages.get()
+        try:
+            if cookie is not None and self._page_cookies[page] != cookie:
+                await page.context.add_cookies([parse_cookie(cookie)])
+                self._page_cookies[page] = cookie
+            await self.load_board(page, fen_string)
+            return await page.screenshot(**screenshot_kwargs)
+        except PlaywrightError as e:
+            print(f"Ошибка скриншота {fen_string}: {e}")
+            return None
+        finally:
+            self._free_pages.put_nowait(page)
+
+    async def shot(self, fen_string, output_filename, clip=BOARD_CLIP):
+        """Сохраняет скриншот доски по FEN, возвращает 0 при успехе
+
+        Браузер сразу обрезает снимок по clip (clip=None - вся страница),
+        без повторного чтения и пересжатия PNG.
+        """
+        png_bytes = await self.screenshot(fen_string, path=output_filename, clip=clip)
+        return 0 if png_bytes is not None else 1
+
+    async def shot_bytes(self, fen_string, clip=BOARD_CLIP, cookie=None):
+        """Возвращает PNG байты только доски (по clip) без записи на диск, None при ошибке"""
+        return await self.screenshot(fen_string, cookie, clip=clip)
+
+    async def shots(self, fen_strings, output_filenames, clip=BOARD_CLIP):
+        """Делает скриншоты списка FEN параллельно, возвращает список статусов"""
+        return await asyncio.gather(*[self.shot(fen_string, output_filename, clip)
+                                      for fen_string, output_filename in zip(fen_strings, output_filenames)])
+
+
+def parse_cookie(cookie):
+    """Переводит строку 'name=value' в cookie для Playwright"""
+    name, value = cookie.split('=', 1)
+    return {'name': name, 'value': value, 'url': LICHESS_URL}
+
+
+async def take_chess_screenshots(fen_strings, output_filenames, cookie=None, n_workers=8, clip=BOARD_CLIP):
+    """Запускает пул, делает скриншоты списка FEN и закрывает браузер"""
+    async with PlaywrightScreenshotPool(n_workers, cookie) as pool:
+        return await pool.shots(fen_strings, output_filenames, clip)
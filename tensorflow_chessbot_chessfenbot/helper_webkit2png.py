@@ -1,48 +1,153 @@
+import os
 import sys
-from PyQt5.QtCore import QTimer
+import multiprocessing
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer, QUrl
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtWebEngineWidgets import QWebEngineView
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage, QWebEngineProfile
 from PyQt5.QtWebEngineCore import QWebEngineSettings
 
+# Доска chessground отрисована, когда страница и шрифты загружены, на доске все фигуры
+# из FEN (%d) и у каждой фигуры применен фон из стилей набора фигур
+# (то же условие, что helper_playwright.BOARD_READY_JS)
+BOARD_READY_JS = ("document.readyState === 'complete' && document.fonts.status === 'loaded' "
+                  "&& document.querySelectorAll('cg-board piece').length === %d "
+                  "&& Array.from(document.querySelectorAll('cg-board piece'))"
+                  ".every(p => getComputedStyle(p).backgroundImage !== 'none')")
+POLL_INTERVAL_MS = 50
+# Не ждем дольше прежней фиксированной задержки
+MAX_WAIT_MS = 2000
+
+
+def get_application():
+    """Возвращает общий QApplication процесса, создает его при первом вызове"""
+    app = QCoreApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+    return app
+
 
 class ChessScreenshotServer:
     """Класс для создания скриншотов шахматных досок с Lichess"""
 
-    def __init__(self, url=None, output_filename=None):
+    def __init__(self, url=None, output_filename=None, profile_name=None):
         self.url = url
         self.output_filename = output_filename
-        self.app = QApplication(sys.argv)
+        self.app = get_application()
         self.view = QWebEngineView()
 
+        # Отдельный именованный профиль (свой кэш и хранилище), нужен параллельным воркерам
+        if profile_name:
+            profile = QWebEngineProfile(profile_name, self.view)
+            self.view.setPage(QWebEnginePage(profile, self.view))
+        self._loop = None
+        self._status = 1
+        self._waited_ms = 0
+        self._n_pieces = 0
+
         # Включаем поддержку JavaScript
         settings = self.view.settings()
         settings.setAttribute(QWebEngineSettings.JavascriptEnabled, True)
 
-    def render_screenshot(self):
-        """Создает скриншот после загрузки страницы"""
-        def capture():
-            self.view.grab().save(self.output_filename, "PNG")
-            print(f"Скриншот сохранен в {self.output_filename}")
-            self.app.quit()
+        # Статические ресурсы Lichess берем из дискового кэша на повторных загрузках
+        self.view.page().profile().setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+
+        # Подключаем сигнал один раз, view переиспользуется между скриншотами
+        self.view.loadFinished.connect(self.render_screenshot)
 
-        # Запускаем таймер, чтобы дождаться загрузки страницы перед скриншотом
-        QTimer.singleShot(2000, capture)
+    def render_screenshot(self, success=True):
+        """Создает скриншот, как только доска отрисована"""
+        if not success:
+            print(f"Ошибка загрузки страницы {self.url}")
+            self._status = 1
+            self._loop.quit()
+            return
 
-    def take_screenshot(self, url=None, output_filename=None):
-        """Загружает страницу и сохраняет скриншот"""
+        self._waited_ms = 0
+        self.poll_board_ready()
+
+    def poll_board_ready(self):
+        """Проверяет через JavaScript, готова ли доска, и повторяет через POLL_INTERVAL_MS"""
+        def on_result(ready):
+            if ready:
+                self.capture()
+            elif self._waited_ms >= MAX_WAIT_MS:
+                # Без фигур скриншот дал бы тайлы с неверными метками, не сохраняем
+                print(f"Доска не отрисовалась за {MAX_WAIT_MS} мс: {self.url}")
+                self._status = 1
+                self._loop.quit()
+            else:
+                self._waited_ms += POLL_INTERVAL_MS
+                QTimer.singleShot(POLL_INTERVAL_MS, self.poll_board_ready)
+
+        self.view.page().runJavaScript(BOARD_READY_JS % self._n_pieces, on_result)
+
+    def capture(self):
+        """Сохраняет скриншот и завершает цикл ожидания"""
+        self.view.grab().save(self.output_filename, "PNG")
+        print(f"Скриншот сохранен в {self.output_filename}")
+        self._status = 0
+        self._loop.quit()
+
+    def take_screenshot(self, url=None, output_filename=None, n_pieces=0):
+        """Загружает страницу и сохраняет скриншот, когда на доске n_pieces фигур,
+        возвращает 0 при успехе"""
+        self._n_pieces = n_pieces
         if url:
             self.url = url
         if output_filename:
             self.output_filename = output_filename
 
-        self.view.loadFinished.connect(self.render_screenshot)
-        self.view.load(self.url)
-        sys.exit(self.app.exec_())
+        # Локальный цикл событий вместо app.exec_(), чтобы Qt продолжал жить
+        # между скриншотами
+        self._status = 1
+        self._loop = QEventLoop()
+        self.view.load(QUrl(self.url))
+        self._loop.exec_()
+        return self._status
 
     def take_chess_screenshot(self, fen_string, output_filename):
         """Создает скриншот шахматной доски на Lichess по FEN"""
         url_template = f"https://lichess.org/editor/{fen_string}"
-        self.take_screenshot(url_template, output_filename)
+        # Число фигур в расстановке (без очереди хода и прочих полей)
+        layout = fen_string.split('_')[0].split(' ')[0]
+        n_pieces = sum(c.isalpha() for c in layout)
+        return self.take_screenshot(url_template, output_filename, n_pieces)
+
+    def take_chess_screenshots(self, fen_strings, output_filenames):
+        """Создает скриншоты для списка FEN в одном QApplication, возвращает список статусов"""
+        return [self.take_chess_screenshot(fen_string, output_filename)
+                for fen_string, output_filename in zip(fen_strings, output_filenames)]
+
+
+# ChessScreenshotServer процесса-воркера, создается один раз в _init_worker
+_worker_server = None
+
+
+def _init_worker():
+    """Поднимает QApplication и ChessScreenshotServer в процессе-воркере"""
+    global _worker_server
+    # Номер воркера в пуле (1..n) стабилен между запусками, в отличие от pid, поэтому
+    # профиль и его дисковый кэш переиспользуются, а не копятся новые
+    worker_index = multiprocessing.current_process()._identity[0]
+    _worker_server = ChessScreenshotServer(profile_name=f"chessbot_worker_{worker_index}")
+
+
+def _worker_screenshot(job):
+    """Делает один скриншот в процессе-воркере"""
+    fen_string, output_filename = job
+    return _worker_server.take_chess_screenshot(fen_string, output_filename)
+
+
+def take_chess_screenshots_parallel(fen_strings, output_filenames, n_workers=None):
+    """Создает скриншоты для списка FEN в n_workers процессах, возвращает список статусов
+
+    Каждый воркер один раз запускает свой QApplication со своим профилем и
+    дальше переиспользует его для всех своих досок.
+    """
+    # spawn, а не fork: Qt нельзя безопасно копировать в дочерний процесс
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(n_workers or os.cpu_count(), initializer=_init_worker) as pool:
+        return pool.map(_worker_screenshot, zip(fen_strings, output_filenames), chunksize=1)
 
 
 if __name__ == "__main__":
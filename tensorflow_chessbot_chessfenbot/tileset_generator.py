@@ -16,10 +16,14 @@
 # in the output folder
 # Used for building training datasets
 from chessboard_finder import *
+from helper_functions import getFENtileLabels
 import os
 import glob
+import multiprocessing
+from io import BytesIO
 
-def saveTiles(tiles, img_save_dir, img_file):
+def saveTiles(tiles, img_save_dir, img_file, compress_level=1):
+  # compress_level 1 instead of PNG default 6, tiles are tiny and zlib dominates save time
   letters = 'ABCDEFGH'
   if not os.path.exists(img_save_dir):
     os.makedirs(img_save_dir)
@@ -31,13 +35,105 @@ def saveTiles(tiles, img_save_dir, img_file):
     if tiles.shape != (32,32,64):
       PIL.Image.fromarray(tiles[:,:,i]) \
           .resize([32,32], PIL.Image.ADAPTIVE) \
-          .save(sqr_filename)
+          .save(sqr_filename, compress_level=compress_level)
     else:
       # Possibly saving floats 0-1 needs to change fromarray settings
       PIL.Image.fromarray((tiles[:,:,i]*255).astype(np.uint8)) \
-          .save(sqr_filename)
+          .save(sqr_filename, compress_level=compress_level)
+
+def tilesFromBytes(img_bytes):
+  """Return 32x32x64 tiles for an in-memory image of a tightly cropped chessboard (ex. PNG screenshot bytes)"""
+  img_arr = np.array(PIL.Image.open(BytesIO(img_bytes)).convert("L"), dtype=np.float32)
+
+  # Image is only the chessboard, so its corners are the image bounds
+  corners = [0, 0, img_arr.shape[1], img_arr.shape[0]]
+  return getChessTilesGray(img_arr, corners)
+
+def saveTilesFromBytes(img_bytes, output_tile_folder, img_file, compress_level=1):
+  """Save tiles for an in-memory image of a tightly cropped chessboard (ex. PNG screenshot bytes)
+  Only takes picklable arguments, so it can run in a process pool"""
+  tiles = tilesFromBytes(img_bytes)
+  img_save_dir = "%s/tiles_%s" % (output_tile_folder, img_file)
+  saveTiles(tiles, img_save_dir, img_file, compress_level)
+
+class TileShardWriter(object):
+  """Accumulates tiles and their labels into fixed size arrays, written out as one
+  shard every shard_size tiles instead of one PNG file per tile.
+
+  Each shard is a pair of raw .npy files, <prefix>_<n>_tiles.npy (N x 32 x 32 uint8)
+  and <prefix>_<n>_labels.npy (N uint8 piece index into '1KQRBNPkqrbnp'), with no
+  entropy coder so they write fast and can be memory mapped (see loadTileShards)."""
+  def __init__(self, output_folder, shard_size=4096, prefix='tiles'):
+    self.output_folder = output_folder
+    self.shard_size = shard_size
+    self.prefix = prefix
+    self.tiles = np.empty([shard_size, 32, 32], dtype=np.uint8)
+    self.labels = np.empty(shard_size, dtype=np.uint8)
+    self.count = 0 # Tiles in current shard
+    if not os.path.exists(output_folder):
+      os.makedirs(output_folder)
+
+    # Continue numbering after shards from earlier runs instead of overwriting them
+    existing = glob.glob("%s/%s_*_tiles.npy" % (output_folder, prefix))
+    shard_numbers = [int(os.path.basename(path)[len(prefix)+1:-len('_tiles.npy')]) for path in existing]
+    self.num_shards = max(shard_numbers) + 1 if shard_numbers else 0
+
+  def add(self, tiles, labels):
+    """Add 32x32x64 normalized tiles (as from getChessTilesGray) with 64 label indices"""
+    tiles = np.round(tiles.transpose(2, 0, 1) * 255).astype(np.uint8)
+    i = 0
+    while i < len(tiles):
+      n = min(len(tiles) - i, self.shard_size - self.count)
+      self.tiles[self.count:self.count+n] = tiles[i:i+n]
+      self.labels[self.count:self.count+n] = labels[i:i+n]
+      self.count += n
+      i += n
+      if self.count == self.shard_size:
+        self.flush()
+
+  def flush(self):
+    """Write out current shard if it has any tiles"""
+    if self.count == 0:
+      return
+    shard_path = "%s/%s_%05d" % (self.output_folder, self.prefix, self.num_shards)
+    np.save(shard_path + '_tiles.npy', self.tiles[:self.count])
+    np.save(shard_path + '_labels.npy', self.labels[:self.count])
+    self.num_shards += 1
+    self.count = 0
+
+  def close(self):
+    self.flush()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+def processBoardImage(job):
+  """Cut one chessboard image into tiles, run per image in generateTileset's worker pool.
+  Saves tile PNGs into img_save_dir, or returns the tiles when img_save_dir is None.
+  Returns (success, tiles or None)"""
+  img_path, img_file, img_save_dir = job
+  img_arr = np.array(loadImageGrayscale(img_path), dtype=np.float32)
+
+  corners = findChessboardCorners(img_arr)
+  if corners is None:
+    return False, None
+  tiles = getChessTilesGray(img_arr, corners)
+  if len(tiles) == 0:
+    return False, None
+
+  if img_save_dir is None:
+    return True, tiles
+  saveTiles(tiles, img_save_dir, img_file)
+  return True, None
+
+def generateTileset(input_chessboard_folder, output_tile_folder, tile_writer=None, n_workers=None):
+  # If a TileShardWriter is given, tiles go into its shards instead of per-tile PNGs,
+  # labelled from the FEN at the end of each image filename
+  # Boards are independent, so they are loaded and cut up in n_workers processes (default all cores)
 
-def generateTileset(input_chessboard_folder, output_tile_folder):
   # Create output folder as needed
   if not os.path.exists(output_tile_folder):
     os.makedirs(output_tile_folder)
@@ -51,37 +147,34 @@ def generateTileset(input_chessboard_folder, output_tile_folder):
   num_failed = 0
   num_skipped = 0
 
-  for i, img_path in enumerate(img_files):
-    print("#% 3d/%d : %s" % (i+1, len(img_files), img_path))
+  jobs = []
+  for img_path in img_files:
     # Strip to just filename
     img_file = img_path[len(input_chessboard_folder):-4]
 
     # Create output save directory or skip this image if it exists
     img_save_dir = "%s/tiles_%s" % (output_tile_folder, img_file)
     
-    if os.path.exists(img_save_dir):
-      print("\tSkipping existing")
+    if tile_writer is None and os.path.exists(img_save_dir):
+      print("\tSkipping existing %s" % img_path)
       num_skipped += 1
       continue
-    
-    # Load image
-    print("---")
-    print("Loading %s..." % img_path)
-    img_arr = np.array(loadImageGrayscale(img_path), dtype=np.float32)
-
-    # Get tiles
-    print("\tGenerating tiles for %s..." % img_file)
-    corners = findChessboardCorners(img_arr)
-    tiles = getChessTilesGray(img_arr, corners)
-
-    # Save tiles
-    if len(tiles) > 0:
-      print("\tSaving tiles %s" % img_file)
-      saveTiles(tiles, img_save_dir, img_file)
-      num_success += 1
-    else:
-      print("\tNo Match, skipping")
-      num_failed += 1
+
+    jobs.append((img_path, img_file, img_save_dir if tile_writer is None else None))
+
+  # chunksize 16 amortizes pickling per job, results come back in job order
+  with multiprocessing.Pool(n_workers or os.cpu_count()) as pool:
+    for i, (job, (success, tiles)) in enumerate(zip(jobs, pool.imap(processBoardImage, jobs, chunksize=16))):
+      img_path, img_file, _ = job
+      print("#% 3d/%d : %s" % (i+1, len(jobs), img_path))
+      if success:
+        print("\tSaved tiles %s" % img_file)
+        if tile_writer is not None:
+          tile_writer.add(tiles, getFENtileLabels(img_file[-71:]))
+        num_success += 1
+      else:
+        print("\tNo Match, skipping")
+        num_failed += 1
 
   print("\t%d/%d generated, %d failures, %d skipped." % (num_success,
     len(img_files) - num_skipped, num_failed, num_skipped))
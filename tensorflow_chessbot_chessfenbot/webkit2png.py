@@ -4,17 +4,22 @@ from PyQt5.QtCore import QTimer, QUrl
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtWidgets import QApplication
 
+# Страница считается готовой, когда документ и шрифты загружены
+PAGE_READY_JS = "document.readyState === 'complete' && document.fonts.status === 'loaded'"
+
 
 class WebRenderer(QWebEngineView):
     """Рендеринг веб-страницы и создание скриншота."""
 
-    def __init__(self, url, width=1024, height=768, timeout=5, wait_time=2):
+    def __init__(self, url, width=1024, height=768, timeout=5, wait_time=2, poll_interval_ms=50):
         super().__init__()
         self.url_to_load = url
         self.width = width
         self.height = height
         self.timeout = timeout
         self.wait_time = wait_time
+        self.poll_interval_ms = poll_interval_ms
+        self.waited_ms = 0
 
         self.setFixedSize(self.width, self.height)
 
@@ -30,10 +35,22 @@ class WebRenderer(QWebEngineView):
             print("Ошибка загрузки страницы!")
             QApplication.exit(1)
 
-        print("Страница загружена, ждем перед скриншотом...")
+        print("Страница загружена, ждем готовности страницы...")
+
+        # Опрашиваем готовность страницы, wait_time - максимальное ожидание
+        self.waited_ms = 0
+        self.poll_page_ready()
+
+    def poll_page_ready(self):
+        """Проверяет через JavaScript, отрисована ли страница, и повторяет через poll_interval_ms"""
+        def on_result(ready):
+            if ready or self.waited_ms >= self.wait_time * 1000:
+                self.capture_screenshot()
+            else:
+                self.waited_ms += self.poll_interval_ms
+                QTimer.singleShot(self.poll_interval_ms, self.poll_page_ready)
 
-        # Ожидание перед рендерингом (для полной загрузки контента)
-        QTimer.singleShot(self.wait_time * 1000, self.capture_screenshot)
+        self.page().runJavaScript(PAGE_READY_JS, on_result)
 
     def capture_screenshot(self):
         """Создание скриншота после загрузки страницы."""
@@ -22,22 +22,19 @@
 # Take most probable set from TF response, use that to generate a FEN of the
 # board, and bot comments on thread with FEN and link to lichess analysis.
 # 
-# A lot of tensorflow code here is heavily adopted from the [tensorflow tutorials](https://www.tensorflow.org/versions/0.6.0/tutorials/pdes/index.html)
+# The convolution helpers here were originally adopted from the [tensorflow tutorials](https://www.tensorflow.org/versions/0.6.0/tutorials/pdes/index.html), the image processing itself is plain numpy/scipy
 
 # ---
-# ## Start TF session
+# ## Setup
 
 # In[1]:
 
 
 import numpy as np
-import tensorflow as tf
 from IPython import get_ipython
 
 np.set_printoptions(suppress=True)
 
-sess = tf.InteractiveSession()
-
 # ## Load image
 # 
 # Let's first load a simple chessboard image taken off of reddit, we'll start simple, with the board filling up the entire space. Let's get the imports out of the way
@@ -47,8 +44,9 @@ sess = tf.InteractiveSession()
 
 # Imports for visualization
 import PIL.Image
-from io import StringIO
+from io import BytesIO
 from IPython.display import Image, display
+import scipy.ndimage
 import scipy.signal
 
 
@@ -56,7 +54,7 @@ def display_array(a, fmt='jpeg', rng=[0, 1]):
     """Display an array as a picture."""
     a = (a - rng[0]) / float(rng[1] - rng[0]) * 255
     a = np.uint8(np.clip(a, 0, 255))
-    f = StringIO()
+    f = BytesIO()
     PIL.Image.fromarray(a).save(f, fmt)
     display(Image(data=f.getvalue()))
 
@@ -98,7 +96,9 @@ if img.size[0] > 2000 or img.size[1] > 2000:
         # resize by height
         ratio = new_size / img.size[1]
     print("Reducing by factor of %.2g" % (1. / ratio))
-    img = img.resize(img.size * ratio, PIL.Image.ADAPTIVE)
+    # Resize the color image before grayscale conversion so all later stages work on the small array
+    new_wh = tuple((np.array(img.size) * ratio).astype(int))
+    img = img.resize(new_wh, PIL.Image.LANCZOS)
     print("New size: (%d x %d)" % (img.size[0], img.size[1]))
 
 # See original image
@@ -107,8 +107,8 @@ display_array(np.asarray(img), rng=[0, 255])
 # In[31]:
 
 
-# Convert to grayscale and array
-a = np.asarray(img.convert("L"), dtype=np.float32)
+# Convert to grayscale and array, kept as uint8 since everything downstream is integer math
+a = np.asarray(img.convert("L"), dtype=np.uint8)
 
 # Display array
 display_array(a, rng=[0, 255])
@@ -121,55 +121,42 @@ display_array(a, rng=[0, 255])
 # In[7]:
 
 
-def make_kernel(a):
-    """Transform a 2D array into a convolution kernel"""
-    a = np.asarray(a)
-    a = a.reshape(list(a.shape) + [1, 1])
-    return tf.constant(a, dtype=1)
-
-
 def simple_conv(x, k):
     """A simplified 2D convolution operation"""
-    x = tf.expand_dims(tf.expand_dims(x, 0), -1)
-    y = tf.nn.depthwise_conv2d(x, k, [1, 1, 1, 1], padding='SAME')
-    return y[0, :, :, 0]
+    return scipy.ndimage.correlate(x, np.asarray(k, dtype=np.float32), output=np.float32, mode='constant')
 
 
 def gradientx(x):
     """Compute the x gradient of an array"""
-    gradient_x = make_kernel([[-1., 0., 1.],
-                              [-1., 0., 1.],
-                              [-1., 0., 1.]])
-    return simple_conv(x, gradient_x)
+    # Separable: [-1, 0, 1] across columns, then [1, 1, 1] down rows
+    # For uint8 input the result is within +-765, exact in int16
+    gx = scipy.ndimage.correlate1d(x, [-1, 0, 1], axis=1, output=np.int16, mode='constant')
+    return scipy.ndimage.correlate1d(gx, [1, 1, 1], axis=0, output=np.int16, mode='constant')
 
 
 def gradienty(x):
-    """Compute the x gradient of an array"""
-    gradient_y = make_kernel([[-1., -1, -1], [0., 0, 0], [1., 1, 1]])
-    return simple_conv(x, gradient_y)
+    """Compute the y gradient of an array"""
+    # Separable: [-1, 0, 1] down rows, then [1, 1, 1] across columns
+    gy = scipy.ndimage.correlate1d(x, [-1, 0, 1], axis=0, output=np.int16, mode='constant')
+    return scipy.ndimage.correlate1d(gy, [1, 1, 1], axis=1, output=np.int16, mode='constant')
 
 
 def corners(x):
     """Find chess square corners in an array"""
-    chess_corner = make_kernel([[-1., 0, 1], [0., 0., 0.], [1., 0, -1]])
-    return simple_conv(x, chess_corner)
+    return simple_conv(x, [[-1., 0, 1], [0., 0., 0.], [1., 0, -1]])
 
 
 # Following are meant for binary images
 def dilate(x, size=3):
     """Dilate"""
-    kernel = make_kernel(np.ones([size, size], dtype=np.float32))
-    return tf.clip_by_value(simple_conv(x, kernel),
-                            np.float32(1),
-                            np.float32(2)) - np.float32(1)
+    return np.clip(simple_conv(x, np.ones([size, size])), 1, 2) - 1
 
 
 def erode(x, size=3):
     """Erode"""
-    kernel = make_kernel(np.ones([size, size]))
-    return tf.clip_by_value(simple_conv(x, kernel),
-                            np.float32(size * size - 1),
-                            np.float32(size * size)) - np.float32(size * size - 1)
+    return np.clip(simple_conv(x, np.ones([size, size])),
+                   size * size - 1,
+                   size * size) - (size * size - 1)
 
 
 def opening(x, size=3):
@@ -182,47 +169,36 @@ def closing(x, size=3):
 
 def skeleton(x, size=3):
     """Skeletonize"""
-    return tf.clip_by_value(erode(x) - opening(erode(x)),
-                            0.,
-                            1.)
+    return np.clip(erode(x) - opening(erode(x)), 0., 1.)
 
 
-# Now that we've got our kernels ready for convolution, let's create our tf variables.
+# Now that we've got our kernels ready for convolution, let's get the gradients of our grayscale image.
 
 # In[8]:
 
 
-# Get our grayscale image matrix
-A = tf.Variable(a)
-
 # Get X & Y gradients and subtract opposite gradient
 # Strongest response where gradient is unidirectional
 # clamp into range 0-1
-# Dx = tf.clip_by_value(np.abs(gradientx(A)) - np.abs(gradienty(A)),
-#                       0., 1.)
-# Dy = tf.clip_by_value(np.abs(gradienty(A)) - np.abs(gradientx(A)),
-#                       0., 1.)
-
-Dx = gradientx(A)
-Dy = gradienty(A)
+# Dx = np.clip(np.abs(gradientx(a)) - np.abs(gradienty(a)),
+#              0., 1.)
+# Dy = np.clip(np.abs(gradienty(a)) - np.abs(gradientx(a)),
+#              0., 1.)
 
-# Dxy = np.abs(gradientx(A) * gradienty(A))
-# Dc = np.abs(corners(A))
+Dx = gradientx(a)
+Dy = gradienty(a)
 
+# Dxy = np.abs(gradientx(a) * gradienty(a))
+# Dc = np.abs(corners(a))
 
-# In[9]:
-
-
-# Initialize state to initial conditions
-tf.initialize_all_variables().run()
 
 # Let's look at the gradients, we apply opening to them also to clean up noise
 
 # In[10]:
 
 
-display_array(Dx.eval(), rng=[-255, 255])
-display_array(Dy.eval(), rng=[-255, 255])
+display_array(Dx, rng=[-255, 255])
+display_array(Dy, rng=[-255, 255])
 
 # Looks pretty good, now how to find lines? Well with a [Hough transform](https://en.wikipedia.org/wiki/Hough_transform) we resample into a parameter space of lines based on two variables $r$ and $\theta$ for example. In our case we already know we're doing vertical and horizontal lines so instead of a 2D space we just need two 1D spaces. In fact, we can simply do this by summing along the axes for each gradient.
 # 
@@ -231,16 +207,24 @@ display_array(Dy.eval(), rng=[-255, 255])
 # In[11]:
 
 
-Dx_pos = tf.clip_by_value(Dx, 0., 255., name="dx_positive")
-Dx_neg = tf.clip_by_value(Dx, -255., 0., name='dx_negative')
-Dy_pos = tf.clip_by_value(Dy, 0., 255., name="dy_positive")
-Dy_neg = tf.clip_by_value(Dy, -255., 0., name='dy_negative')
+def hough_1d(D, axis):
+    """Product of positive and negative gradient sums along axis, normalized to 0-255*255"""
+    # Single clipped buffer, reused in-place for the absolute sum:
+    # pos = (|D| + D) / 2, neg = (|D| - D) / 2 summed along axis
+    # Sums are exact integers, only the final product is done in float
+    D = np.clip(D, -255, 255)
+    d_sum = D.sum(axis, dtype=np.int32)
+    d_abs_sum = np.abs(D, out=D).sum(axis, dtype=np.int32)
+    pos = (d_abs_sum + d_sum) // 2
+    neg = (d_abs_sum - d_sum) // 2
+    return pos.astype(np.float64) * neg / (D.shape[axis] * D.shape[axis])
+
 
 # In[12]:
 
 
-hough_Dx = tf.reduce_sum(Dx_pos, 0) * tf.reduce_sum(-Dx_neg, 0) / (a.shape[0] * a.shape[0])
-hough_Dy = tf.reduce_sum(Dy_pos, 1) * tf.reduce_sum(-Dy_neg, 1) / (a.shape[1] * a.shape[1])
+hough_Dx = hough_1d(Dx, 0)
+hough_Dy = hough_1d(Dy, 1)
 # Normalized to 0-255*255=65025 range
 
 
@@ -255,17 +239,18 @@ import matplotlib.pyplot as plt
 fig, (ax1, ax2) = plt.subplots(1, 2, sharey=True, figsize=(15, 5))
 
 # Arbitrarily choose half of max value as threshold, since they're such strong responses
-hough_Dx_thresh = tf.reduce_max(hough_Dx) * 3 / 5
-hough_Dy_thresh = tf.reduce_max(hough_Dy) * 3 / 5
+# Computed once here and reused by the plots and line detection below
+hough_Dx_thresh = float(hough_Dx.max()) * 3 / 5
+hough_Dy_thresh = float(hough_Dy.max()) * 3 / 5
 
-ax1.plot(hough_Dx.eval());
-ax1.axhline(hough_Dx_thresh.eval(), lw=2, linestyle=':', color='r')
+ax1.plot(hough_Dx);
+ax1.axhline(hough_Dx_thresh, lw=2, linestyle=':', color='r')
 ax1.set_title('Hough Gradient X')
 ax1.set_xlabel('Pixel')
 ax1.set_xlim(0, a.shape[1])
 
-ax2.plot(hough_Dy.eval())
-ax2.axhline(hough_Dy_thresh.eval(), lw=2, linestyle=':', color='r')
+ax2.plot(hough_Dy)
+ax2.axhline(hough_Dy_thresh, lw=2, linestyle=':', color='r')
 ax2.set_title('Hough Gradient Y')
 ax2.set_xlim(0, a.shape[0])
 ax2.set_xlabel('Pixel');
@@ -312,38 +297,17 @@ def pruneLines(lineset):
     return lineset
 
 
-def skeletonize_1d(arr):
-    """return skeletonized 1d array (thin to single value, favor to the right)"""
-    _arr = arr.copy()  # create a copy of array to modify without destroying original
-    # Go forwards
-    for i in range(_arr.size - 1):
-        # Will right-shift if they are the same
-        if arr[i] <= _arr[i + 1]:
-            _arr[i] = 0
-
-    # Go reverse
-    for i in np.arange(_arr.size - 1, 0, -1):
-        if _arr[i - 1] > _arr[i]:
-            _arr[i] = 0
-    return _arr
-
-
 def getChessLines(hdx, hdy, hdx_thresh, hdy_thresh):
     """Returns pixel indices for the 7 internal chess lines in x and y axes"""
-    # Blur
-    gausswin = scipy.signal.gaussian(21, 4)
-    gausswin /= np.sum(gausswin)
-
     # Blur where there is a strong horizontal or vertical line (binarize)
-    blur_x = np.convolve(hdx > hdx_thresh, gausswin, mode='same')
-    blur_y = np.convolve(hdy > hdy_thresh, gausswin, mode='same')
-
-    skel_x = skeletonize_1d(blur_x)
-    skel_y = skeletonize_1d(blur_y)
+    # Gaussian with sigma 4 over 21 taps (truncate 2.5 sigma), zero beyond the ends
+    blur_x = scipy.ndimage.gaussian_filter1d((hdx > hdx_thresh).astype(np.float64), 4, truncate=2.5, mode='constant')
+    blur_y = scipy.ndimage.gaussian_filter1d((hdy > hdy_thresh).astype(np.float64), 4, truncate=2.5, mode='constant')
 
-    # Find points on skeletonized arrays (where returns 1-length tuple)
-    lines_x = np.where(skel_x)[0]  # vertical lines
-    lines_y = np.where(skel_y)[0]  # horizontal lines
+    # Local maxima of the blurred arrays. Lines give flat peaks (the gradient response is
+    # 2 px wide), take their right edge like the old right-favoring skeletonize did
+    lines_x = scipy.signal.find_peaks(blur_x, plateau_size=1)[1]['right_edges']  # vertical lines
+    lines_y = scipy.signal.find_peaks(blur_y, plateau_size=1)[1]['right_edges']  # horizontal lines
 
     # Prune inconsistent lines
     lines_x = pruneLines(lines_x)
@@ -355,15 +319,17 @@ def getChessLines(hdx, hdy, hdx_thresh, hdy_thresh):
 
 
 # Get chess lines
-lines_x, lines_y, is_match = getChessLines(hough_Dx.eval().flatten(), \
-                                           hough_Dy.eval().flatten(), \
-                                           hough_Dx_thresh.eval(), \
-                                           hough_Dy_thresh.eval())
+lines_x, lines_y, is_match = getChessLines(hough_Dx, \
+                                           hough_Dy, \
+                                           hough_Dx_thresh, \
+                                           hough_Dy_thresh)
 
-lines_x, lines_y, is_match = getChessLines(hough_Dx.eval().flatten(), \
-                                           hough_Dy.eval().flatten(), \
-                                           hough_Dx_thresh.eval() * .9, \
-                                           hough_Dy_thresh.eval() * .9)
+# Retry with a slightly lower threshold only if that didn't find a chessboard
+if not is_match:
+    lines_x, lines_y, is_match = getChessLines(hough_Dx, \
+                                               hough_Dy, \
+                                               hough_Dx_thresh * .9, \
+                                               hough_Dy_thresh * .9)
 
 print("X", lines_x, np.diff(lines_x))
 print("Y", lines_y, np.diff(lines_y))
@@ -375,17 +341,17 @@ else:
 # In[16]:
 
 
-# Plot blurred 1d hough arrays and skeletonized versions
+# Plot 1d hough arrays and the lines found from their peaks
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 5))
 
-ax1.plot(hough_Dx.eval());
-ax1.axhline(hough_Dx_thresh.eval(), lw=2, linestyle=':', color='r')
+ax1.plot(hough_Dx);
+ax1.axhline(hough_Dx_thresh, lw=2, linestyle=':', color='r')
 ax1.set_title('Hough Gradient X')
 ax1.set_xlabel('Pixel')
 ax1.set_xlim(0, a.shape[1])
 
-ax2.plot(hough_Dy.eval())
-ax2.axhline(hough_Dy_thresh.eval(), lw=2, linestyle=':', color='r')
+ax2.plot(hough_Dy)
+ax2.axhline(hough_Dy_thresh, lw=2, linestyle=':', color='r')
 ax2.set_title('Hough Gradient Y')
 ax2.set_xlim(0, a.shape[0])
 ax2.set_xlabel('Pixel');
@@ -417,92 +383,41 @@ print("X   (vertical)", lines_x, np.diff(lines_x))
 print("Y (horizontal)", lines_y, np.diff(lines_y))
 
 
+def getTileIndices(sets, step):
+    """Returns (8, step) pixel indices of each tile along one axis given the 9 line positions"""
+    x1 = sets[:-1]
+    x2 = sets[1:]
+    # Tiles longer than step keep their first pixels, the last tile keeps its last ones.
+    # Shorter tiles are padded at the outer side (left, or right for the last tile)
+    # by repeating the border pixel, done by clipping indices to the tile range.
+    starts = np.minimum(x1, x2 - step)
+    starts[-1] = max(x1[-1], x2[-1] - step)
+    idx = starts[:, None] + np.arange(step)
+    return np.clip(idx, x1[:, None], x2[:, None] - 1)
+
+
 def getChessTiles(a, lines_x, lines_y):
-    """Split up input grayscale array into 64 tiles stacked in a 3D matrix using the chess linesets"""
+    """Split up input grayscale array into 64 tiles stacked in a (64, stepy, stepx) matrix using the chess linesets"""
     # Find average square size, round to a whole pixel for determining edge pieces sizes
     stepx = np.int32(np.round(np.mean(np.diff(lines_x))))
     stepy = np.int32(np.round(np.mean(np.diff(lines_y))))
 
-    # Pad edges as needed to fill out chessboard (for images that are partially over-cropped)
-    #     print stepx, stepy
-    #     print "x",lines_x[0] - stepx, "->", lines_x[-1] + stepx, a.shape[1]
-    #     print "y", lines_y[0] - stepy, "->", lines_y[-1] + stepy, a.shape[0]
-    padr_x = 0
-    padl_x = 0
-    padr_y = 0
-    padl_y = 0
-
-    if lines_x[0] - stepx < 0:
-        padl_x = np.abs(lines_x[0] - stepx)
-    if lines_x[-1] + stepx > a.shape[1] - 1:
-        padr_x = np.abs(lines_x[-1] + stepx - a.shape[1])
-    if lines_y[0] - stepy < 0:
-        padl_y = np.abs(lines_y[0] - stepy)
-    if lines_y[-1] + stepx > a.shape[0] - 1:
-        padr_y = np.abs(lines_y[-1] + stepy - a.shape[0])
-
-    # New padded array
-    #     print "Padded image to", ((padl_y,padr_y),(padl_x,padr_x))
-    a2 = np.pad(a, ((padl_y, padr_y), (padl_x, padr_x)), mode='edge')
-
-    setsx = np.hstack([lines_x[0] - stepx, lines_x, lines_x[-1] + stepx]) + padl_x
-    setsy = np.hstack([lines_y[0] - stepy, lines_y, lines_y[-1] + stepy]) + padl_y
-
-    a2 = a2[setsy[0]:setsy[-1], setsx[0]:setsx[-1]]
-    setsx -= setsx[0]
-    setsy -= setsy[0]
-    #     display_array(a2, rng=[0,255])
-    #     print "X:",setsx
-    #     print "Y:",setsy
-
-    # Matrix to hold images of individual squares (in grayscale)
-    #     print "Square size: [%g, %g]" % (stepy, stepx)
-    squares = np.zeros([np.round(stepy), np.round(stepx), 64], dtype=np.uint8)
-
-    # For each row
-    for i in range(0, 8):
-        # For each column
-        for j in range(0, 8):
-            # Vertical lines
-            x1 = setsx[i]
-            x2 = setsx[i + 1]
-            padr_x = 0
-            padl_x = 0
-            padr_y = 0
-            padl_y = 0
-
-            if (x2 - x1) > stepx:
-                if i == 7:
-                    x1 = x2 - stepx
-                else:
-                    x2 = x1 + stepx
-            elif (x2 - x1) < stepx:
-                if i == 7:
-                    # right side, pad right
-                    padr_x = stepx - (x2 - x1)
-                else:
-                    # left side, pad left
-                    padl_x = stepx - (x2 - x1)
-            # Horizontal lines
-            y1 = setsy[j]
-            y2 = setsy[j + 1]
-
-            if (y2 - y1) > stepy:
-                if j == 7:
-                    y1 = y2 - stepy
-                else:
-                    y2 = y1 + stepy
-            elif (y2 - y1) < stepy:
-                if j == 7:
-                    # right side, pad right
-                    padr_y = stepy - (y2 - y1)
-                else:
-                    # left side, pad left
-                    padl_y = stepy - (y2 - y1)
-            # slicing a, rows sliced with horizontal lines, cols by vertical lines so reversed
-            # Also, change order so its A1,B1...H8 for a white-aligned board
-            # Apply padding as defined previously to fit minor pixel offsets
-            squares[:, :, (7 - j) * 8 + i] = np.pad(a2[y1:y2, x1:x2], ((padl_y, padr_y), (padl_x, padr_x)), mode='edge')
+    # Line positions of all 9 tile edges, may lie outside the image for partially over-cropped boards
+    setsx = np.hstack([lines_x[0] - stepx, lines_x, lines_x[-1] + stepx])
+    setsy = np.hstack([lines_y[0] - stepy, lines_y, lines_y[-1] + stepy])
+
+    # Pixel indices of every tile along each axis, (8, stepy) rows and (8, stepx) cols
+    # Clipping to the image repeats its edge pixels, same as padding it with mode='edge'
+    rows = np.clip(getTileIndices(setsy, stepy), 0, a.shape[0] - 1)
+    cols = np.clip(getTileIndices(setsx, stepx), 0, a.shape[1] - 1)
+
+    # Gather all tiles at once, slicing a, rows sliced with horizontal lines, cols by vertical lines
+    # Result is (8 rows, 8 cols, stepy, stepx)
+    tiles = a[rows[:, None, :, None], cols[None, :, None, :]]
+
+    # Change order so its A1,B1...H8 for a white-aligned board, tiles first (64, stepy, stepx)
+    # so squares[..., None] is already an NHWC batch for the CNN
+    squares = tiles[::-1].reshape(64, stepy, stepx).astype(np.uint8)
     return squares
 
 
@@ -510,7 +425,7 @@ if is_match:
     # Possibly check np.std(np.diff(lines_x)) for variance etc. as well/instead
     print("7 horizontal and vertical lines found, slicing up squares")
     squares = getChessTiles(a, lines_x, lines_y)
-    print("Tiles generated: (%dx%d)*%d" % (squares.shape[0], squares.shape[1], squares.shape[2]))
+    print("Tiles generated: (%dx%d)*%d" % (squares.shape[1], squares.shape[2], squares.shape[0]))
 else:
     print("Number of lines not equal to 7")
 
@@ -524,7 +439,7 @@ if is_match:
     print("Showing 5 random squares...")
     for i in np.random.choice(np.arange(64), 5, replace=False):
         print("#%d: %s%d" % (i, letters[i % 8], i / 8 + 1))
-        display_array(squares[:, :, i], rng=[0, 255])
+        display_array(squares[i], rng=[0, 255])
 else:
     print("Didn't have lines to slice image up.")
 
@@ -544,14 +459,20 @@ else:
         os.makedirs(img_save_dir)
         print("Created dir %s" % img_save_dir)
 
+    # Stitch squares back into a single board image (rank 8 on top) and resize
+    # once to 256x256, so each square comes out as a 32x32 block
+    stepy, stepx = squares.shape[1:]
+    board = squares.reshape(8, 8, stepy, stepx)[::-1] \
+        .transpose(0, 2, 1, 3).reshape(8 * stepy, 8 * stepx)
+    board = np.asarray(PIL.Image.fromarray(board).resize([256, 256], PIL.Image.LANCZOS))
+    tiles = board.reshape(8, 32, 8, 32)[::-1].transpose(0, 2, 1, 3).reshape(64, 32, 32)
+
     for i in range(64):
         sqr_filename = "%s/%s_%s%d.png" % (img_save_dir, img_file[:-4], letters[i % 8], i / 8 + 1)
         if i % 8 == 0:
             print("#%d: saving %s..." % (i, sqr_filename))
 
-        # Make resized 32x32 image from matrix and save
-        PIL.Image.fromarray(squares[:, :, i]) \
-            .resize([32, 32], PIL.Image.ADAPTIVE) \
-            .save(sqr_filename)
+        # Save resized 32x32 image
+        PIL.Image.fromarray(tiles[i]).save(sqr_filename)
 
 # And all the chess squares are saved to their own directory. Now we need to generate a large set of input chessboard images with known FEN patterns, so we can build a training set. Then we need to apply random noises/errors/etc. to increase the robustness of the model.
@@ -15,20 +15,24 @@
 
 
 # Imports
+import asyncio
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import PIL
 import os
+import pathlib
 from IPython.display import Image, display
 
-from tensorflow_chessbot.tensorflow_chessbot_chessfenbot import helper_webkit2png
-from tensorflow_chessbot_chessfenbot import helper_functions as hf
-import tensorflow_chessbot # For generating tilesets from chessboard screenshots
+import sys
 
-# reload(helper_webkit2png.webkit2png)
-# reload(tensorflow_chessbot)
-
-# Load chess screenshot server (wrapper for qt gui)
-chessServer = helper_webkit2png.ChessScreenshotServer()
+# The chessfenbot modules import each other by bare name (ex. `from chessboard_finder import *`),
+# so put their folder on the path, run from the repo root
+sys.path.insert(0, os.path.abspath('tensorflow_chessbot_chessfenbot'))
+import helper_playwright # Headless chromium screenshot pool
+import helper_functions as hf
+import tileset_generator # For generating tilesets from chessboard screenshots
+import helper_image_loading # For caching downloaded/rendered boards
 
 
 # ---
@@ -45,21 +49,45 @@ chessServer = helper_webkit2png.ChessScreenshotServer()
 # In[108]:
 
 
+FEN_CHARS = np.frombuffer(b'1KQRBNPkqrbnp', dtype='|S1')
+# Empty squares are trivial to classify, so oversample pieces (3:1 per piece vs empty)
+FEN_CHAR_PROBS = np.array([1.] + [3.]*12) / 37
+
+def getRandomFENs(n, seen=None):
+    """Generate n distinct random FENs at once, skipping any FEN already in seen (which is updated)"""
+    if seen is None:
+        seen = set()
+    fens = []
+    while len(fens) < n:
+        idx = np.random.choice(FEN_CHARS.size, size=(n - len(fens), 64), p=FEN_CHAR_PROBS)
+        # View each run of 8 single-byte chars as one 8-byte rank, shape (n, 8)
+        ranks = FEN_CHARS[idx].view('|S8')
+        # can append ' w' or ' b' for white/black to play, defaults to white
+        for fen_ranks in ranks:
+            fen = b'/'.join(fen_ranks).decode('ascii')
+            if fen not in seen:
+                seen.add(fen)
+                fens.append(fen)
+    return fens
+
 def getRandomFEN():
-    fen_chars = list('1KQRBNPkqrbnp')
-    pieces = np.random.choice(fen_chars, 64)
-    fen = '/'.join([''.join(pieces[i*8:(i+1)*8]) for i in range(8)])
-    # can append ' w' or ' b' for white/black to play, defaults to white
-    return fen
+    return getRandomFENs(1)[0]
+
+# Filenames can't hold '/', so ranks are separated by '-' there instead
+FEN_FILENAME_TRANS = bytes.maketrans(b'/', b'-')
+
+def getFENFilenames(fens):
+    """Return fens in filename form ('/' -> '-'), translated in one pass over the whole batch"""
+    return '\n'.join(fens).encode('ascii').translate(FEN_FILENAME_TRANS).decode('ascii').split('\n')
 
 fen = getRandomFEN()
 print(fen + ' w KQkq - 0 1')
-print(fen.replace('/','-'))
+print(getFENFilenames([fen])[0])
 
 
 # ---
 # ## Generating screenshots of the FEN
-# This seemingly daunting task is actually not too bad thanks to the help of several others.  One way is to programmatically load a url and get a render is to use [`pythonwebkit2png`](https://github.com/adamn/python-webkit2png). 
+# This seemingly daunting task is actually not too bad thanks to the help of several others.  One way is to programmatically load a url and get a render is to use [`pythonwebkit2png`](https://github.com/adamn/python-webkit2png), here we use a headless chromium through [Playwright](https://playwright.dev/python/) so several pages can load concurrently. 
 # 
 # In our case we will use several websites eventually, but this notebook shows just [lichess](https://lichess.org). Lichess provides a RESTful protocol `https://lichess.org/editor/<FEN-STRING>` which loads a page with the board in the FEN configuration.
 
@@ -67,10 +95,12 @@ print(fen.replace('/','-'))
 
 
 # Set up URL and output image filename for this run
-url = "http://en.lichess.org/editor/%s" % getRandomFEN()
+fen = getRandomFEN()
+url = helper_playwright.LICHESS_EDITOR_URL % fen
 output_filename = "testA.png"
 
-status = chessServer.takeScreenshot(url,output_filename)
+# Whole page this time, to see the layout
+status = asyncio.run(helper_playwright.take_chess_screenshots([fen], [output_filename], n_workers=1, clip=None))[0]
 if status == 0:
     print ("Success")
 else:
@@ -86,7 +116,7 @@ print ("FEN:",url)
 display(Image("testA.png"))
 
 
-# Awesome! Since every render will have the same layout we can crop the picture after the fact to hold just the board.
+# Awesome! Since every render will have the same layout the browser can clip the screenshot to hold just the board, no need to crop after the fact.
 
 # In[50]:
 
@@ -94,9 +124,8 @@ display(Image("testA.png"))
 # Crop boundaries
 # 218,141
 # 737,658
-im = PIL.Image.open("testA.png")
-im = im.crop([218,141,737,658])
-im.save("testA_crop.png")
+print (helper_playwright.BOARD_CLIP)
+asyncio.run(helper_playwright.take_chess_screenshots([fen], ["testA_crop.png"], n_workers=1))
 display(Image("testA_crop.png"))
 
 
@@ -108,31 +137,22 @@ display(Image("testA_crop.png"))
 # Number of random screenshots to generate
 N = 1
 
-out_folder = 'train_gen_lichess'
-if not os.path.exists(out_folder):
-    os.makeoutput_tile_folders(out_folder)
-
-output_filenameA = "testA.png"
-output_filenameB = "testB.png"
-output_filenames = [output_filenameA, output_filenameB]
-for i in range(N):
-    # Generate random FEN
-    fen = getRandomFEN()
+out_folder = pathlib.Path('train_gen_lichess')
+out_folder.mkdir(parents=True, exist_ok=True)
 
-    print ("#%d : %s" % (i,fen))
-    output_filename = "%s/lichess%04d__%s.png" % (out_folder, i, fen.replace('/','-'))
+# Generate random FENs
+fens = getRandomFENs(N)
+output_filenames = [out_folder / f'lichess{i:04d}__{safe_fen}.png' for i, safe_fen in enumerate(getFENFilenames(fens))]
 
-    # Render webpage and save screenshot
-    status = chessServer.takeChessScreenshot(fen,output_filename)
+# Render webpages concurrently and save screenshots clipped to the board
+statuses = asyncio.run(helper_playwright.take_chess_screenshots(fens, output_filenames))
 
+for i, (fen, output_filename, status) in enumerate(zip(fens, output_filenames, statuses)):
+    print ("#%d : %s" % (i,fen))
     if status == 0:
         print ("\t...Success")
     else:
         print ("\tFailed on %s -> %s" % (fen, output_filename))
-        break
-
-    # Load image, crop and overwrite file
-    im = PIL.Image.open(output_filename).crop([218,141,737,658]).save(output_filename)
 
 
 # ---
@@ -199,49 +219,114 @@ print ("%d themes, %d sets, %d backgrounds = %d combinations" % (len(themes), le
 
 # Number of random screenshots to generate
 N = 5
-out_folder = 'train_images'
-if not os.path.exists(out_folder):
-    os.makeoutput_tile_folders(out_folder)
-#
-code = '4eecbbd0982b8d26060c17c3de8f5602ae335290-sid=JSWp1JBD&theme=wood&bg=dark&pieceSet=cburnett'
-code = '67193ee101f00274ea7d6bc77143486a3dde571f-sid=JSWp1JBD&theme=wood3&bg=dark&pieceSet=cburnett'
-code = 'b7d9a7cae17ff905547e70fb8f6d0a50c12bd374-sid=JSWp1JBD&theme=leather&bg=dark&pieceSet=cburnett'
-code = 'f7a1bab2c73cdf316f8bf5dc1d8edc251acc0f2f-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=cburnett'
-code = 'cf31a05a7b738a4c89d5bddf16dbde0d3c57082d-sid=JSWp1JBD&theme=blue&bg=dark&pieceSet=alpha'
-code = '07c1a977da8b8eae5678a79e79e210cbd4580010-sid=JSWp1JBD&theme=wood&bg=dark&pieceSet=alpha'
-code = 'f7fb62b208d088c9adc20482f68bff20d622ffc4-sid=JSWp1JBD&theme=leather&bg=dark&pieceSet=alpha'
-code = 'ca778a1d8b8680824d6501f68e6db721351fea0a-sid=JSWp1JBD&theme=wood3&bg=dark&pieceSet=alpha'
-code = 'a526bbcc9c4e1e00889474b70b53101f4087a0eb-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=merida'
-code = 'fc8d4d2042dcea51baee213c62eae8405fc9bcee-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=pirouetti'
-code = 'b257e599862eeb99bcbed10c2aeaa784d25e345d-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=chessnut'
-code = 'a6b8c83fd2f311060dbad47693d344758f6f5e24-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=chess7'
-code = 'd5e79b290d1073e0b86978e97c9af6f81d0b0e9e-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=reillycraig'
-code = '85f4f0f8f80804683c8ddd719e6c9dd9ffb697e9-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=merida'
-code = '21cc203f3087b359862644ee20cc549420d9549d-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=cburnett'
-code = '4c333906715a33b5d48908f44603508b8c767a10-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=alpha'
-for i in range(N):
-    # Generate random FEN
-    fen = getRandomFEN()
-
-    print ("#%d : %s" % (i,fen))
-    output_filename = "%s/lichess%04d__%s.png" % (out_folder, i, fen.replace('/','-'))
-
-    # Render webpage and save screenshot
-    # Unfortunately have to generate cookie manually
-    theme,bg,pieceSet = themes[2],"dark",pieceSets[0]
-
-    cookie = 'lila2=%s'%code
-
-    status = chessServer.takeChessScreenshot(fen,output_filename,cookie)
+out_folder = pathlib.Path('train_images')
+output_tile_folder = 'tiles/train_tiles_C'
+# Tiles are cut from the screenshot in memory, only keep the board images on disk for inspection
+save_boards = False
+# Write tiles with their labels into .npy shards instead of one PNG per tile
+save_shards = True
+# Board images are kept in a cache keyed by FEN and cookie, and hardlinked into out_folder.
+# Random FENs practically never repeat, so the cache is only useful for keeping the boards:
+# without save_boards it would just write every screenshot to disk for nothing
+diagram_cache = helper_image_loading.DiagramCache('cache/diagrams') if save_boards else None
+out_folder.mkdir(parents=True, exist_ok=True)
+# Unfortunately have to generate cookies manually: lila2 is signed by lichess, so the
+# theme/bg/pieceSet can't just be edited into one cookie. Keyed by (theme, bg, pieceSet)
+lichess_cookies = {
+    ('wood', 'dark', 'cburnett'): 'lila2=4eecbbd0982b8d26060c17c3de8f5602ae335290-sid=JSWp1JBD&theme=wood&bg=dark&pieceSet=cburnett',
+    ('wood3', 'dark', 'cburnett'): 'lila2=67193ee101f00274ea7d6bc77143486a3dde571f-sid=JSWp1JBD&theme=wood3&bg=dark&pieceSet=cburnett',
+    ('leather', 'dark', 'cburnett'): 'lila2=b7d9a7cae17ff905547e70fb8f6d0a50c12bd374-sid=JSWp1JBD&theme=leather&bg=dark&pieceSet=cburnett',
+    ('canvas', 'dark', 'cburnett'): 'lila2=f7a1bab2c73cdf316f8bf5dc1d8edc251acc0f2f-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=cburnett',
+    ('blue', 'dark', 'alpha'): 'lila2=cf31a05a7b738a4c89d5bddf16dbde0d3c57082d-sid=JSWp1JBD&theme=blue&bg=dark&pieceSet=alpha',
+    ('wood', 'dark', 'alpha'): 'lila2=07c1a977da8b8eae5678a79e79e210cbd4580010-sid=JSWp1JBD&theme=wood&bg=dark&pieceSet=alpha',
+    ('leather', 'dark', 'alpha'): 'lila2=f7fb62b208d088c9adc20482f68bff20d622ffc4-sid=JSWp1JBD&theme=leather&bg=dark&pieceSet=alpha',
+    ('wood3', 'dark', 'alpha'): 'lila2=ca778a1d8b8680824d6501f68e6db721351fea0a-sid=JSWp1JBD&theme=wood3&bg=dark&pieceSet=alpha',
+    ('canvas', 'dark', 'merida'): 'lila2=a526bbcc9c4e1e00889474b70b53101f4087a0eb-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=merida',
+    ('canvas', 'dark', 'pirouetti'): 'lila2=fc8d4d2042dcea51baee213c62eae8405fc9bcee-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=pirouetti',
+    ('canvas', 'dark', 'chessnut'): 'lila2=b257e599862eeb99bcbed10c2aeaa784d25e345d-sid=JSWp1JBD&theme=canvas&bg=dark&pieceSet=chessnut',
+    ('blue3', 'dark', 'chess7'): 'lila2=a6b8c83fd2f311060dbad47693d344758f6f5e24-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=chess7',
+    ('blue3', 'dark', 'reillycraig'): 'lila2=d5e79b290d1073e0b86978e97c9af6f81d0b0e9e-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=reillycraig',
+    ('blue3', 'dark', 'merida'): 'lila2=85f4f0f8f80804683c8ddd719e6c9dd9ffb697e9-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=merida',
+    ('blue3', 'dark', 'cburnett'): 'lila2=21cc203f3087b359862644ee20cc549420d9549d-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=cburnett',
+    ('blue3', 'dark', 'alpha'): 'lila2=4c333906715a33b5d48908f44603508b8c767a10-sid=JSWp1JBD&theme=blue3&bg=dark&pieceSet=alpha',
+}
+
+# Every combination we have a cookie for, N random boards each, streamed through the workers
+combos = [combo for combo in itertools.product(themes, backgrounds, pieceSets) if combo in lichess_cookies]
+jobs = []
+for theme, bg, pieceSet in combos:
+    fens = getRandomFENs(N)
+    for i, (fen, safe_fen) in enumerate(zip(fens, getFENFilenames(fens))):
+        img_file = f'lichess_{theme}_{bg}_{pieceSet}_{i:04d}__{safe_fen}'
+        jobs.append((lichess_cookies[theme, bg, pieceSet], fen, img_file))
+print ("%d combinations, %d boards" % (len(combos), len(jobs)))
+
+async def generateLichessTiles(jobs, tile_writer=None, n_workers=8):
+    """Screenshot each (cookie, fen, img_file) job and cut it into tiles in memory, returns list of statuses
+
+    Jobs go through a queue consumed by n_workers workers, one per browser page,
+    each page switching its context cookie as the theme changes. With a
+    TileShardWriter, tiles and labels go into its shards, otherwise each tile is
+    saved as a PNG."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    for i, job in enumerate(jobs):
+        queue.put_nowait((i, job))
+    statuses = [1] * len(jobs)
+
+    # Tile decode and PNG compression are CPU bound, run them in worker processes
+    # while the browser keeps taking screenshots
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        async with helper_playwright.PlaywrightScreenshotPool(n_workers) as pool:
+            async def process(cookie, fen, img_file):
+                # Cropped board PNG straight from the browser, never re-read from disk
+                if diagram_cache is None:
+                    png_bytes = await pool.shot_bytes(fen, cookie=cookie)
+                    if png_bytes is None:
+                        return 1
+                else:
+                    url = helper_playwright.LICHESS_EDITOR_URL % fen
+                    png_bytes = diagram_cache.get(url, cookie)
+                    if png_bytes is None:
+                        png_bytes = await pool.shot_bytes(fen, cookie=cookie)
+                        if png_bytes is None:
+                            return 1
+                        diagram_cache.put(url, png_bytes, cookie)
+                    # Board image is already in the cache, hardlink it instead of writing a copy
+                    diagram_cache.link(url, out_folder / f'{img_file}.png', cookie)
+                if tile_writer is not None:
+                    tiles = await loop.run_in_executor(executor, tileset_generator.tilesFromBytes, png_bytes)
+                    tile_writer.add(tiles, hf.getFENtileLabels(fen))
+                else:
+                    await loop.run_in_executor(executor, tileset_generator.saveTilesFromBytes,
+                                               png_bytes, output_tile_folder, img_file)
+                return 0
+
+            async def worker():
+                while not queue.empty():
+                    i, job = queue.get_nowait()
+                    # One failed board (timeout, closed page, bad PNG) must not stop
+                    # this worker, its status stays 1 and the next job is taken
+                    try:
+                        statuses[i] = await process(*job)
+                    except Exception as e:
+                        print ("Job #%d failed: %r" % (i, e))
+
+            await asyncio.gather(*[worker() for _ in range(n_workers)])
+    return statuses
+
+if save_shards:
+    with tileset_generator.TileShardWriter(output_tile_folder) as tile_writer:
+        statuses = asyncio.run(generateLichessTiles(jobs, tile_writer))
+else:
+    statuses = asyncio.run(generateLichessTiles(jobs))
 
+for i, ((cookie, fen, img_file), status) in enumerate(zip(jobs, statuses)):
+    print ("#%d : %s" % (i,img_file))
     if status == 0:
         print ("\t...Success")
     else:
-        print ("\tFailed on %s -> %s" % (fen, output_filename))
-        break
-
-    # Load image, crop and overwrite file
-    im = PIL.Image.open(output_filename).crop([218,141,737,658]).save(output_filename)
+        print ("\tFailed on %s" % fen)
 
 
 # # Generating from FEN diagram generators
@@ -255,37 +340,88 @@ for i in range(N):
 # In[101]:
 
 
-import urllib, io
-def generateRandomBoards(n, outfolder, img_url_template, fen_chars='1KQRBNPkqrbnp'):
-    """Given chess diagram template url, generate n random FEN diagrams from url and save images to outfolder"""
+import io
+from datetime import timedelta
+import aiohttp
+from aiohttp_client_cache import CachedSession, SQLiteBackend
+
+# Empty square is - for jinchess and _ for apronus
+FEN_CHARS_JIN = np.frombuffer(b'-KQRBNPkqrbnp', dtype='|S1')
+FEN_CHARS_APR = np.frombuffer(b'_KQRBNPkqrbnp', dtype='|S1')
+
+async def generateRandomBoards(n, outfolder, img_url_template, fen_chars=FEN_CHARS_JIN, max_connections=10, session=None):
+    """Given chess diagram template url, generate n random FEN diagrams from url and save images to outfolder
+
+    Pass an open aiohttp session to reuse its connections across calls, a
+    CachedSession skips downloading diagrams fetched on earlier runs."""
     # http://www.jinchess.com/chessboard/?p=rnbqkbnrpppppppp----------P----------------R----PP-PPPPPRNBQKBNR
     # http://www.apronus.com/chess/stilldiagram.php?d=DRNBQKBNRPP_PPPPP__P______P___________p_____k____pppQp_pprnbq_bnr0
     # No / separators for either choice
 
     # Create output folder as needed
-    if not os.path.exists(outfolder):
-        os.makedirs(outfolder)
-
-    for i in range(n):
-        fen_chars = list(fen_chars)
-        fen_arr = np.random.choice(fen_chars, 64)
-        fen = ''.join(fen_arr)
-        img_url = img_url_template % fen
-        img = PIL.Image.open(io.StringIO(urllib.urlopen(img_url).read()))
-        if 'apronus' in img_url_template:
-            # need to flip FEN file order since the are 1-8 vs 8-1 of normal FEN.
-            fen_arr = np.hstack(np.split(fen_arr,8)[::-1])
-
-        # Replace - or _ with 1 to be consistent with actual FEN notation
-        fen_arr[fen_arr == fen_chars[0]] = '1'
-
-        # Add - between sets of 8 to be consistent with saved file format (later converted to / again for analysis link)
-        fen = '-'.join(map(''.join, np.split(fen_arr, 8)))
-
-        img.save(os.path.join(outfolder, fen+'.png'))
+    outfolder = pathlib.Path(outfolder)
+    outfolder.mkdir(parents=True, exist_ok=True)
+
+    # All n boards at once, shape (n, 64) of single-byte chars, pieces oversampled like getRandomFENs
+    idx = np.random.choice(fen_chars.size, size=(n, 64), p=FEN_CHAR_PROBS)
+    all_boards = fen_chars[idx]
+    # Drop duplicate boards, no point downloading the same diagram twice
+    _, keep = np.unique(all_boards.view('|S64').ravel(), return_index=True)
+    all_boards = all_boards[np.sort(keep)]
+    n = len(all_boards)
+    # One memcpy for all url payloads, then slice 64 chars per board
+    payloads = all_boards.tobytes().decode('ascii')
+    img_urls = [img_url_template % payloads[i*64:(i+1)*64] for i in range(n)]
+
+    # Download all diagrams concurrently, at most max_connections requests at a time
+    sem = asyncio.Semaphore(max_connections)
+    async def fetch(session, img_url):
+        async with sem, session.get(img_url) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            img_blobs = await asyncio.gather(*[fetch(session, img_url) for img_url in img_urls], return_exceptions=True)
+    else:
+        img_blobs = await asyncio.gather(*[fetch(session, img_url) for img_url in img_urls], return_exceptions=True)
+
+    ranks = all_boards.reshape(n, 8, 8)
+    if 'apronus' in img_url_template:
+        # need to flip FEN file order since the are 1-8 vs 8-1 of normal FEN.
+        ranks = ranks[:, ::-1]
+
+    # Replace - or _ with 1 to be consistent with actual FEN notation
+    ranks = np.where(ranks == fen_chars[0], b'1', ranks)
+
+    # Add - between sets of 8 to be consistent with saved file format (later converted to / again for analysis link)
+    # Separators go in as a 9th column, minus the trailing one, so each FEN is one 71 byte row
+    names = np.full((n, 8, 9), b'-', dtype='|S1')
+    names[:, :, :8] = ranks
+    fens = names.reshape(n, 72)[:, :71].tobytes().decode('ascii')
+    fens = [fens[i*71:(i+1)*71] for i in range(n)]
+
+    for fen, img_url, img_blob in zip(fens, img_urls, img_blobs):
+        # One failed download only skips that board
+        if isinstance(img_blob, Exception):
+            print ("Failed on %s : %s" % (img_url, img_blob))
+            continue
+        img = PIL.Image.open(io.BytesIO(img_blob))
+        img.save(outfolder / f'{fen}.png')
 #
-generateRandomBoards(20,'chessboards/train_images', "http://www.jinchess.com/chessboard/?p=%s", '-KQRBNPkqrbnp')
-generateRandomBoards(20,'chessboards/train_images', "http://www.apronus.com/chess/stilldiagram.php?d=_%s", '_KQRBNPkqrbnp')
+os.makedirs('cache', exist_ok=True)
+
+async def generateDiagramBoards():
+    # HTTP cache for the diagram sites: honours their Cache-Control/ETag headers, and keeps
+    # responses 30 days when the server sends none. The backend closes with its session,
+    # so make a new one per run
+    http_cache = SQLiteBackend('cache/diagrams.sqlite', expire_after=timedelta(days=30), cache_control=True)
+    # One session for both sites, keeps connections alive between requests
+    async with CachedSession(cache=http_cache) as session:
+        await generateRandomBoards(20,'chessboards/train_images', "http://www.jinchess.com/chessboard/?p=%s", FEN_CHARS_JIN, session=session)
+        await generateRandomBoards(20,'chessboards/train_images', "http://www.apronus.com/chess/stilldiagram.php?d=_%s", FEN_CHARS_APR, session=session)
+
+asyncio.run(generateDiagramBoards())
 
 
 # ---
@@ -299,7 +435,8 @@ generateRandomBoards(20,'chessboards/train_images', "http://www.apronus.com/ches
 input_chessboard_folder = 'chessboards/train_images'
 output_tile_folder = 'tiles/train_tiles_C'
 
-tensorflow_chessbot.generateTileset(input_chessboard_folder, output_tile_folder)
+# Boards are cut into tiles in parallel, one worker process per core
+tileset_generator.generateTileset(input_chessboard_folder, output_tile_folder, n_workers=os.cpu_count())
 
 
 # Alright, with 150 boards, we have 9600 tiles with the format `<FEN>_<RANK><FILE>.png`
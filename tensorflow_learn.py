@@ -23,7 +23,7 @@
 import tensorflow as tf
 import numpy as np
 import PIL
-import urllib, io
+import urllib.request, io
 import glob
 from IPython.core.display import Markdown
 
@@ -60,6 +60,16 @@ train_images, train_labels = hf.loadFENtiles(train_paths) # Load from generated
 print( "Loading %d Training tiles" % test_paths.size)
 test_images, test_labels = hf.loadFENtiles(test_paths) # Load from generated set
 
+# Tiles the lichess generator wrote into .npy shards (tensorflow_generate_training_data.py),
+# split in the same ratio and added to both sets
+(shard_train_images, shard_train_labels), (shard_test_images, shard_test_labels) = \
+    hf.loadFENtileShards("tiles/train_tiles_C", ratio)
+print ("Loading %d tiles from shards" % (len(shard_train_labels) + len(shard_test_labels)))
+train_images = np.concatenate([train_images, shard_train_images])
+train_labels = np.concatenate([train_labels, shard_train_labels])
+test_images = np.concatenate([test_images, shard_test_images])
+test_labels = np.concatenate([test_labels, shard_test_labels])
+
 train_dataset = hf.DataSet(train_images, train_labels, dtype=tf.float32)
 test_dataset = hf.DataSet(test_images, test_labels, dtype=tf.float32)
 
@@ -257,7 +267,7 @@ def getPrediction(img):
 def makePrediction(image_url):
     """Given image url to a chessboard image, return a visualization of FEN and link to a lichess analysis"""
     # Load image from url and display
-    img = PIL.Image.open(io.StringIO(urllib.urlopen(image_url).read()))
+    img = PIL.Image.open(io.BytesIO(urllib.request.urlopen(image_url).read()))
 
     print ("Image on which to make prediction: %s" % image_url)
     hf.display_image(img.resize([200,200], PIL.Image.ADAPTIVE))